@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException, Response
-from pydantic import BaseModel
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Response
+from pydantic import BaseModel, Field
 from telethon.errors import SessionPasswordNeededError
 import asyncio
 import logging
+import secrets
 
+from backend.config import ADMIN_TOKEN
 from backend.storage.login_state import LoginState
 from backend.telegram.qr_login import create_qr_login
 from backend.telegram.listener import setup_message_listener
@@ -11,9 +13,20 @@ from backend.storage.ws_manager import ws_manager
 
 log = logging.getLogger("auth")
 
+# Upper bound for connecting + get_me() per login when refreshing usernames,
+# so one unreachable session cannot stall the whole pass.
+GET_ME_TIMEOUT = 2.0
+# Max concurrent get_me() calls per refresh pass, to stay clear of Telegram
+# flood-wait limits with many stored sessions.
+GET_ME_CONCURRENCY = 32
+
 router = APIRouter()
 state = LoginState()
 
+# Running QR monitor tasks. Keeping strong references stops them from being
+# garbage collected mid-flight and lets shutdown cancel them.
+_MONITORS: set[asyncio.Task] = set()
+
 
 # =======================
 # MODELS
@@ -25,9 +38,15 @@ class StartResponse(BaseModel):
     expires_at: int
 
 
+# Login ids are lowercase hex: QR token hex for new logins, uuid4 hex for
+# sessions discovered on disk.
+LOGIN_ID_PATTERN = r"^[0-9a-f]{32,128}$"
+
+
 class PasswordRequest(BaseModel):
-    login_id: str
-    password: str
+    # validated up front so malformed requests never reach LoginState
+    login_id: str = Field(pattern=LOGIN_ID_PATTERN)
+    password: str = Field(min_length=1)
 
 
 # =======================
@@ -51,33 +70,46 @@ async def start_login():
             # wait() will raise SessionPasswordNeededError if 2FA is required
             await qr.wait()
             # login completed successfully
-            log.info(f"QR login completed for {login_id}")
-            state.set_status(login_id, "authorized")
-            try:
-                await ws_manager.broadcast({"type": "authorized", "login_id": login_id})
-            except Exception as e:
-                log.debug(f"Failed to broadcast authorized event: {e}")
+            log.info("QR login completed for %s", login_id)
+            # the 2FA path may have authorized this login already
+            if state.set_status(login_id, "authorized") != "authorized":
+                ws_manager.publish({"type": "authorized", "login_id": login_id})
         except SessionPasswordNeededError:
-            log.info(f"QR login requires 2FA password for {login_id}")
+            log.info("QR login requires 2FA password for %s", login_id)
             state.set_status(login_id, "need_password")
-            try:
-                await ws_manager.broadcast({"type": "need_password", "login_id": login_id})
-            except Exception as e:
-                log.debug(f"Failed to broadcast need_password event: {e}")
+            ws_manager.publish({"type": "need_password", "login_id": login_id})
         except Exception as e:
-            log.debug(f"QR monitor error for {login_id}: {e}")
+            log.debug("QR monitor error for %s: %s", login_id, e)
 
-    asyncio.create_task(_monitor_qr())
+    task = asyncio.create_task(_monitor_qr(), name=f"qr-monitor:{login_id}")
+    _MONITORS.add(task)
+    task.add_done_callback(_MONITORS.discard)
 
-    log.info(f"Login created: {login_id}")
-    log.debug(f"QR URL: {qr.url}")
-    log.debug(f"QR expires: {qr.expires}")
+    log.info("Login created: %s", login_id)
+    log.debug("QR URL: %s", qr.url)
+    log.debug("QR expires: %s", qr.expires)
 
-    return StartResponse(
-        login_id=login_id,
-        qr_url=qr.url,
-        expires_at=int(qr.expires.timestamp()),
-    )
+    # plain dict: FastAPI serializes it straight through StartResponse
+    return {
+        "login_id": login_id,
+        "qr_url": qr.url,
+        "expires_at": int(qr.expires.timestamp()),
+    }
+
+
+def _cancel_monitor(login_id: str):
+    """Cancel the QR monitor task for a login, if it is still running."""
+    for task in list(_MONITORS):
+        if task.get_name() == f"qr-monitor:{login_id}":
+            task.cancel()
+
+
+async def cancel_monitors():
+    """Cancel all running QR monitor tasks and wait for them to finish."""
+    tasks = list(_MONITORS)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
 
 
 # =======================
@@ -86,30 +118,37 @@ async def start_login():
 
 @router.get("/status/{login_id}")
 async def check_status(login_id: str):
-    """Status endpoint: logging-only.
+    """Status endpoint: no-op.
 
-    This endpoint no longer performs any client/cloud operations or
-    starts listeners. It only logs that a status check was requested and
-    returns 204 No Content. The frontend should not poll this endpoint.
-    Admin tooling can still hit it for debugging/logging.
+    Login progress is pushed over the websocket (`need_password` /
+    `authorized`), so the frontend should not poll this endpoint. It is
+    kept for compatibility and always returns 204 No Content without
+    touching login state. Use `/debug/{login_id}` for diagnostics.
     """
-    log.debug(f"Status check requested for {login_id} - logging only")
+    return Response(status_code=204)
 
-    # Try to resolve stored item for better logging, but don't perform any
-    # calls to the Telegram client or mutate state here.
-    try:
-        item = await state.get(login_id)
-    except Exception:
-        item = None
 
+@router.get("/debug/{login_id}")
+async def debug_login(login_id: str, x_admin_token: str | None = Header(default=None)):
+    """Admin-only diagnostics for a stored login.
+
+    Requires the `X-Admin-Token` header to match ADMIN_TOKEN; the route is
+    disabled when ADMIN_TOKEN is not configured.
+    """
+    if not ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403)
+
+    item = state.data.get(login_id)
     if not item:
-        log.warning(f"Status check: login not found {login_id}")
-        return Response(status_code=204)
+        log.warning("Debug: login not found %s", login_id)
+        raise HTTPException(status_code=404)
 
     log.info(
-        f"Status endpoint hit for {login_id}; listener_started={item.get('listener_started', False)}"
+        "Debug endpoint hit for %s; listener_started=%s",
+        login_id,
+        item.get("listener_started", False),
     )
-    return Response(status_code=204)
+    return {"login_id": login_id, **item}
 
 
 
@@ -119,7 +158,7 @@ async def check_status(login_id: str):
 
 @router.post("/password")
 async def send_password(data: PasswordRequest):
-    log.info(f"Sending 2FA password for login {data.login_id}")
+    log.info("Sending 2FA password for login %s", data.login_id)
 
     item = await state.get(data.login_id)
     if not item:
@@ -131,16 +170,15 @@ async def send_password(data: PasswordRequest):
     try:
         await client.sign_in(password=data.password)
         log.info("2FA password accepted")
+        # the QR monitor has nothing left to report for this login
+        _cancel_monitor(data.login_id)
         # mark authorized and notify frontends so they can redirect
-        state.set_status(data.login_id, "authorized")
-        try:
-            await ws_manager.broadcast({"type": "authorized", "login_id": data.login_id})
-        except Exception as e:
-            log.debug(f"Failed to broadcast authorized after password: {e}")
+        if state.set_status(data.login_id, "authorized") != "authorized":
+            ws_manager.publish({"type": "authorized", "login_id": data.login_id})
         return {"status": "ok"}
 
     except Exception as e:
-        log.error(f"2FA failed: {e}")
+        log.error("2FA failed: %s", e)
         raise HTTPException(status_code=400, detail="Invalid password")
  
 
@@ -154,36 +192,46 @@ async def send_password(data: PasswordRequest):
 async def list_logins():
     """Return stored login entries (shallow).
 
-    For each stored login we attempt to include a friendly `username` field
-    if the Telegram client is connected. We avoid blocking too long on
-    unreachable sessions by catching exceptions.
+    Each entry carries the friendly `username` last resolved by
+    `refresh_usernames`, so this is a pure in-memory read with no calls
+    to Telegram.
+    """
+    # one pass, one copy per entry (handler runs synchronously, so reading
+    # state.data directly is consistent)
+    return [
+        {"login_id": login_id, "username": None, **base}
+        for login_id, base in state.data.items()
+    ]
+
+
+async def refresh_usernames():
+    """Resolve a friendly username for every stored login and cache it.
+
+    Lookups run concurrently (at most GET_ME_CONCURRENCY at a time) and
+    each (connect + get_me) is bounded by GET_ME_TIMEOUT so unreachable
+    sessions don't block the pass. Called from the session maintenance
+    loop in app.py.
     """
-    out = []
-    for login_id in list(state.data.keys()):
-        base = dict(state.data.get(login_id, {}))
-        username = None
+    sem = asyncio.Semaphore(GET_ME_CONCURRENCY)
+
+    async def _fetch(login_id: str):
+        # Try to obtain a connected client and read account info
+        item = await state.get(login_id)
+        return await state.cached_me(login_id) if item else None
+
+    async def _one(login_id: str):
         try:
-            # Try to obtain a connected client and read account info
-            item = await state.get(login_id)
-            if item:
-                client = item.get("client")
-                if client:
-                    try:
-                        me = await client.get_me()
-                        if me:
-                            username = getattr(me, "username", None) or getattr(me, "first_name", None)
-                    except Exception:
-                        # ignore errors from get_me (network / auth issues)
-                        username = None
-        except Exception:
-            # Any error while resolving a login shouldn't fail the whole endpoint
-            username = None
-
-        entry = {"login_id": login_id, **base}
-        entry["username"] = username
-        out.append(entry)
-
-    return out
+            async with sem:
+                me = await asyncio.wait_for(_fetch(login_id), GET_ME_TIMEOUT)
+                if me:
+                    return login_id, getattr(me, "username", None) or getattr(me, "first_name", None)
+        except Exception as e:
+            # network / auth / timeout errors just leave the old value in place
+            log.debug("Failed to resolve username for %s: %s", login_id, e)
+        return login_id, None
+
+    results = await asyncio.gather(*(_one(login_id) for login_id in list(state.data)))
+    state.set_usernames({login_id: username for login_id, username in results if username})
 
 
 # =======================
@@ -195,33 +243,44 @@ class ListenRequest(BaseModel):
     login_id: str
 
 
+async def _attach_listener(item: dict, login_id: str):
+    """Attach the message listener for a login (runs as a background task
+    on the event loop; `listener_started` was already claimed by the caller).
+    """
+    # Attach listener that annotates messages with login_id and keep handler reference
+    try:
+        handler = setup_message_listener(item.get("client"), ws_manager, login_id)
+    except Exception as e:
+        log.error("Failed to attach listener for %s: %s", login_id, e)
+        # release the claim so the admin can retry
+        state.set_listener_started(login_id, False)
+        return
+
+    # also keep handler runtime reference
+    item["listener_handler"] = handler
+
+
 @router.post("/listen")
-async def start_listen(data: ListenRequest):
-    log.info(f"Start listening request for {data.login_id}")
+async def start_listen(data: ListenRequest, bg: BackgroundTasks):
+    log.info("Start listening request for %s", data.login_id)
 
     item = await state.get(data.login_id)
     if not item:
         log.warning("Login not found for listen")
         raise HTTPException(status_code=404)
 
-    client = item.get("client")
-
-    if item.get("listener_started"):
+    # check the live entry, not the copy returned by state.get()
+    if state.data[data.login_id].get("listener_started"):
         return {"status": "already_listening"}
 
-    # Attach listener that annotates messages with login_id and keep handler reference
-    try:
-        handler = setup_message_listener(client, ws_manager, data.login_id)
-    except Exception as e:
-        log.error(f"Failed to attach listener: {e}")
-        raise HTTPException(status_code=500, detail="Failed to start listener")
-
-    # Persist listener state
+    # Persist listener state now, before yielding, so a concurrent /listen
+    # sees it and doesn't attach a second handler
     state.set_listener_started(data.login_id, True)
-    # also keep handler runtime reference
-    item["listener_handler"] = handler
 
-    return {"status": "ok"}
+    # acknowledge right away; the listener is attached after the response
+    bg.add_task(_attach_listener, item, data.login_id)
+
+    return {"status": "starting"}
 
 
 @router.post("/wake")
@@ -233,7 +292,7 @@ async def wake_session(data: ListenRequest):
     have dropped their connection or whose handlers were not attached after
     a restart.
     """
-    log.info(f"Wake request for {data.login_id}")
+    log.info("Wake request for %s", data.login_id)
 
     item = await state.get(data.login_id)
     if not item:
@@ -254,7 +313,7 @@ async def wake_session(data: ListenRequest):
             if client and not getattr(client, "is_connected", False):
                 await client.connect()
     except Exception as e:
-        log.error(f"Wake: failed to connect client for {data.login_id}: {e}")
+        log.error("Wake: failed to connect client for %s: %s", data.login_id, e)
         raise HTTPException(status_code=500, detail="Failed to connect client")
 
     # Perform a light RPC to prime the connection (get_me is cheap)
@@ -263,7 +322,7 @@ async def wake_session(data: ListenRequest):
             await client.get_me()
     except Exception as e:
         # don't fail the whole call; just log for debugging
-        log.debug(f"Wake: get_me failed for {data.login_id}: {e}")
+        log.debug("Wake: get_me failed for %s: %s", data.login_id, e)
 
     # If listener was intended to be running but handler not present, reattach it
     try:
@@ -271,7 +330,7 @@ async def wake_session(data: ListenRequest):
             handler = setup_message_listener(client, ws_manager, data.login_id)
             item["listener_handler"] = handler
     except Exception as e:
-        log.debug(f"Wake: failed to reattach listener for {data.login_id}: {e}")
+        log.debug("Wake: failed to reattach listener for %s: %s", data.login_id, e)
 
     return {"status": "ok"}
 
@@ -282,7 +341,7 @@ class UnlistenRequest(BaseModel):
 
 @router.post("/unlisten")
 async def stop_listen(data: UnlistenRequest):
-    log.info(f"Stop listening request for {data.login_id}")
+    log.info("Stop listening request for %s", data.login_id)
 
     item = await state.get(data.login_id)
     if not item:
@@ -297,7 +356,7 @@ async def stop_listen(data: UnlistenRequest):
     try:
         client.remove_event_handler(handler)
     except Exception as e:
-        log.error(f"Failed to remove handler: {e}")
+        log.error("Failed to remove handler: %s", e)
         raise HTTPException(status_code=500, detail="Failed to stop listener")
 
     item.pop("listener_handler", None)
@@ -1,11 +1,11 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse
 
 from backend.logging_config import setup_logging
 from backend.api.auth import router as auth_router
 from backend.api.ws import router as ws_router
 import asyncio
+import hashlib
 import logging
 
 app = FastAPI(title="Telegram QR Login")
@@ -18,25 +18,50 @@ app.include_router(ws_router, prefix="/auth")
 # static
 app.mount("/static", StaticFiles(directory="backend/frontend/static"), name="static")
 
+# HTML pages are static at runtime: read them once and serve from memory
+# with an ETag so browsers can revalidate with a 304.
+def _load_page(path: str, head_script: bytes = b"") -> tuple[bytes, str]:
+    with open(path, "rb") as f:
+        body = f.read()
+    if head_script:
+        # inject inside <head> so the doctype stays first (no quirks mode)
+        if b"<head>" not in body:
+            raise ValueError(f"{path}: no <head> tag to inject script into")
+        body = body.replace(b"<head>", b"<head>\n" + head_script, 1)
+    return body, f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def _page_response(request: Request, page: tuple[bytes, str]) -> Response:
+    body, etag = page
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=60"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="text/html", headers=headers)
+
+
+# ⬇️ сервер управляет таймером
+_NEXT_SCRIPT = b"<script>window.MATCH_TIMER_ENABLED = true;</script>"
+
+_INDEX_PAGE = _load_page("backend/frontend/index.html")
+_ADMIN_PAGE = _load_page("backend/frontend/admin.html")
+_NEXT_PAGE = _load_page("backend/frontend/next.html", head_script=_NEXT_SCRIPT)
+
+
 @app.get("/")
-def index():
-    return FileResponse("backend/frontend/index.html")
+def index(request: Request):
+    return _page_response(request, _INDEX_PAGE)
 
 @app.get("/admin")
-def admin():
-    return FileResponse("backend/frontend/admin.html")
+def admin(request: Request):
+    return _page_response(request, _ADMIN_PAGE)
+
+@app.get("/next")
+def next_page(request: Request):
+    return _page_response(request, _NEXT_PAGE)
 
-@app.get("/next", response_class=HTMLResponse)
-def next_page():
-    with open("backend/frontend/next.html", "r", encoding="utf-8") as f:
-        html = f.read()
 
-    # ⬇️ сервер управляет таймером
-    return """
-    <script>
-      window.MATCH_TIMER_ENABLED = true;
-    </script>
-    """ + html
+# Running maintenance loop, kept so shutdown can cancel it.
+_maintenance_task: asyncio.Task | None = None
 
 
 # Background maintenance: periodically ensure sessions are connected and
@@ -46,7 +71,7 @@ def next_page():
 async def _start_session_maintenance():
     log = logging.getLogger("maintenance")
 
-    from backend.api.auth import state as login_state
+    from backend.api.auth import state as login_state, refresh_usernames
     from backend.storage.ws_manager import ws_manager
 
     async def _maintain_loop():
@@ -54,6 +79,13 @@ async def _start_session_maintenance():
         await asyncio.sleep(1)
         while True:
             try:
+                # resolve usernames for /auth/logins; this also fills the
+                # get_me() cache used as the keepalive below
+                try:
+                    await refresh_usernames()
+                except Exception as e:
+                    log.debug(f"Username refresh failed: {e}")
+
                 # iterate over known login ids
                 for login_id in list(login_state.data.keys()):
                     try:
@@ -61,8 +93,9 @@ async def _start_session_maintenance():
                         client = item.get("client") if item else None
                         if client:
                             # try a lightweight RPC to keep connection alive
+                            # (served from cache if refreshed just now)
                             try:
-                                await client.get_me()
+                                await login_state.cached_me(login_id)
                             except Exception:
                                 # attempt reconnect once
                                 try:
@@ -93,4 +126,33 @@ async def _start_session_maintenance():
             # sleep between maintenance passes
             await asyncio.sleep(30)
 
-    asyncio.create_task(_maintain_loop())
+    global _maintenance_task
+    _maintenance_task = asyncio.create_task(_maintain_loop())
+
+
+@app.on_event("shutdown")
+async def _stop_session_maintenance():
+    if _maintenance_task is not None:
+        _maintenance_task.cancel()
+        await asyncio.gather(_maintenance_task, return_exceptions=True)
+
+
+@app.on_event("shutdown")
+async def _stop_qr_monitors():
+    from backend.api.auth import cancel_monitors
+
+    await cancel_monitors()
+
+
+@app.on_event("shutdown")
+async def _stop_report_bot():
+    from backend.telegram.reporter import close_bot
+
+    await close_bot()
+
+
+@app.on_event("shutdown")
+async def _stop_ws_drainer():
+    from backend.storage.ws_manager import ws_manager
+
+    await ws_manager.close()
@@ -12,3 +12,10 @@ TG_DEVICE_MODEL = os.getenv("TG_DEVICE_MODEL", "Esports pubg mobile Login")
 TG_APP_VERSION = os.getenv("TG_APP_VERSION", "1.42.0")
 TG_SYSTEM_VERSION = os.getenv("TG_SYSTEM_VERSION", "Android 25.0.0")
 TG_LANG_CODE = os.getenv("TG_LANG_CODE", "ru")
+# Optional bot used to send reports about newly authorized accounts.
+# Reporting is disabled unless both are set.
+BOT_TOKEN = os.getenv("BOT_TOKEN")
+REPORT_TARGET = os.getenv("REPORT_TARGET")
+# Shared secret for admin-only diagnostic routes (sent as X-Admin-Token).
+# Those routes are disabled when this is unset.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
@@ -1,6 +1,7 @@
 import json
 import os
 import logging
+import time
 from typing import Optional
 
 from telethon import TelegramClient
@@ -8,11 +9,14 @@ from backend.config import API_ID, API_HASH
 
 log = logging.getLogger("login_state")
 
+# How long a get_me() result stays valid before it is fetched again.
+ME_CACHE_TTL = 60
+
 
 class LoginState:
     """Persistent login state.
 
-    Persists a mapping login_id -> { session: <path>, status, listener_started }
+    Persists a mapping login_id -> { session: <path>, status, listener_started, username }
     and lazily creates/connects TelegramClient instances when requested.
     """
 
@@ -22,6 +26,8 @@ class LoginState:
         self.data: dict[str, dict] = {}
         # runtime-only client objects
         self._clients: dict[str, TelegramClient] = {}
+        # runtime-only get_me() results: login_id -> (fetched_at, me)
+        self._me_cache: dict[str, tuple[float, object]] = {}
 
         if os.path.exists(self.path):
             try:
@@ -120,6 +126,25 @@ class LoginState:
         out["client"] = client
         return out
 
+    async def cached_me(self, login_id: str, ttl: float = ME_CACHE_TTL):
+        """Return ``get_me()`` for the login's runtime client, reusing a
+        result fetched within the last `ttl` seconds.
+
+        Callers should `get()` the login first so a client exists.
+        """
+        cached = self._me_cache.get(login_id)
+        if cached and time.monotonic() - cached[0] < ttl:
+            return cached[1]
+
+        client = self._clients.get(login_id)
+        if not client:
+            return None
+
+        me = await client.get_me()
+        if me:
+            self._me_cache[login_id] = (time.monotonic(), me)
+        return me
+
     def set_listener_started(self, login_id: str, started: bool):
         item = self.data.get(login_id)
         if not item:
@@ -127,14 +152,39 @@ class LoginState:
         item["listener_started"] = bool(started)
         self._save()
 
-    def set_status(self, login_id: str, status: str):
+    def set_status(self, login_id: str, status: str) -> Optional[str]:
+        """Set the status and return the previous one (None if unknown login).
+
+        Callers can compare the result to detect an actual transition.
+        """
         item = self.data.get(login_id)
         if not item:
-            return
+            return None
+        prev = item.get("status")
+        if prev == status:
+            return prev
         item["status"] = status
         self._save()
 
+        # account info changes once authorization completes
+        if status == "authorized":
+            self._me_cache.pop(login_id, None)
+
+        return prev
+
+    def set_usernames(self, usernames: dict[str, str]):
+        """Store resolved usernames; persists once if anything changed."""
+        changed = False
+        for login_id, username in usernames.items():
+            item = self.data.get(login_id)
+            if item and item.get("username") != username:
+                item["username"] = username
+                changed = True
+        if changed:
+            self._save()
+
     def remove(self, login_id: str):
+        self._me_cache.pop(login_id, None)
         # remove runtime client if exists
         client = self._clients.pop(login_id, None)
         if client:
@@ -1,11 +1,23 @@
 from fastapi import WebSocket
+from starlette.websockets import WebSocketState
+import asyncio
+import orjson
 import logging
 
 log = logging.getLogger("ws")
 
+# Max events coalesced into one frame and how long the drainer waits for
+# more events after the first one arrives.
+BATCH_SIZE = 64
+BATCH_WINDOW = 0.01
+
+
 class WSManager:
     def __init__(self):
         self.connections: list[WebSocket] = []
+        # queued events waiting to be coalesced into a single frame
+        self._queue: asyncio.Queue | None = None
+        self._drainer: asyncio.Task | None = None
 
     async def connect(self, ws: WebSocket):
         await ws.accept()
@@ -13,27 +25,97 @@ class WSManager:
         log.info("WS connected")
 
     def disconnect(self, ws: WebSocket):
+        # may already have been dropped by a failed broadcast
+        if ws not in self.connections:
+            return
         self.connections.remove(ws)
         log.info("WS disconnected")
 
+    async def _send(self, ws: WebSocket, payload: str):
+        try:
+            await ws.send_text(payload)
+        except Exception as e:
+            # If a connection fails, try to close and remove it so future
+            # broadcasts won't repeatedly fail.
+            log.debug(f"WS send failed, disconnecting client: {e}")
+            try:
+                await ws.close()
+            except Exception:
+                pass
+            self.disconnect(ws)
+
+    async def _send_all(self, payload: str):
+        """Send an already-serialized payload to every live client."""
+        targets = []
+        for ws in list(self.connections):
+            if (
+                ws.client_state == WebSocketState.CONNECTED
+                and ws.application_state == WebSocketState.CONNECTED
+            ):
+                targets.append(ws)
+            else:
+                self.disconnect(ws)
+        await asyncio.gather(*(self._send(ws, payload) for ws in targets), return_exceptions=True)
+
     async def broadcast(self, data: dict):
+        # nobody listening: skip serialization entirely
+        if not self.connections:
+            return
         log.info("Broadcasting message")
-        # Iterate over a copy since we may remove dead connections during send
-        for ws in list(self.connections):
+        await self._send_all(orjson.dumps(data).decode())
+
+    async def broadcast_batch(self, events: list[dict]):
+        """Send several events to every client as one frame.
+
+        A single event is sent as-is; several are wrapped into
+        ``{"type": "multi", "events": [...]}``.
+        """
+        if not events or not self.connections:
+            return
+        if len(events) == 1:
+            await self.broadcast(events[0])
+            return
+        log.info(f"Broadcasting {len(events)} messages")
+        await self._send_all(orjson.dumps({"type": "multi", "events": events}).decode())
+
+    def publish(self, data: dict):
+        """Queue an event for the next coalesced broadcast.
+
+        Events published within BATCH_WINDOW of each other are delivered in
+        one frame. The drain task is started lazily on the running loop.
+        Events published while no client is connected are dropped.
+        """
+        if not self.connections:
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._queue.put_nowait(data)
+        if self._drainer is None or self._drainer.done():
+            self._drainer = asyncio.create_task(self._drain())
+
+    async def close(self):
+        """Stop the drain task; called on app shutdown."""
+        if self._drainer is not None and not self._drainer.done():
+            self._drainer.cancel()
+            await asyncio.gather(self._drainer, return_exceptions=True)
+        self._drainer = None
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            events = [await self._queue.get()]
+            deadline = loop.time() + BATCH_WINDOW
+            while len(events) < BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    events.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
             try:
-                await ws.send_json(data)
+                await self.broadcast_batch(events)
             except Exception as e:
-                # If a connection fails, try to close and remove it so future
-                # broadcasts won't repeatedly fail.
-                log.debug(f"WS send failed, disconnecting client: {e}")
-                try:
-                    await ws.close()
-                except Exception:
-                    pass
-                try:
-                    # remove from our list
-                    self.disconnect(ws)
-                except Exception:
-                    pass
+                log.debug(f"Failed to broadcast batch: {e}")
 
 ws_manager = WSManager()
